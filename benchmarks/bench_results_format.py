@@ -0,0 +1,124 @@
+"""Compare disk size and parse time of the json and compact results formats.
+
+Usage: python benchmarks/bench_results_format.py [--days N] [--students N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import decode_compact_results, encode_compact_results, get_zstandard  # noqa: E402
+
+
+def build_history(days: int, students: int, attempts: int = 3, seed: int = 0) -> dict:
+    """Build a synthetic results history shaped like results/results.json.
+
+    `students` take the quiz each day and nobody sits it more than `attempts` times,
+    mirroring ATTEMPT_LIMIT.
+    """
+    rng = random.Random(seed)
+    classes = [f"{grade}-{letter}" for grade in range(5, 9) for letter in "ABCD"]
+    roster = [(f"Name{i}", f"Surname{i}", rng.choice(classes)) for i in range(days * students // attempts + 1)]
+
+    results = {}
+    for day in range(days):
+        student_results = {}
+        section_statistics = {}
+        for name, surname, user_class in rng.sample(roster, k=students):
+            section_scores = {f"Section {s}": round(rng.uniform(0, 100), 2) for s in range(1, 5)}
+            overall_score = sum(section_scores.values()) / len(section_scores)
+            student_results[f"{name.lower()}_{surname.lower()}"] = {
+                "name": name,
+                "surname": surname,
+                "class": user_class,
+                "section_scores": section_scores,
+                "overall_score": overall_score,
+                "status": "PASSED" if overall_score >= 75 else "FAILED",
+            }
+        for s in range(1, 5):
+            section_statistics[str(s)] = {
+                "question_stats": {str(q): {"correct": rng.randint(0, 50), "incorrect": rng.randint(0, 50)}
+                                   for q in range(1, 8)},
+                "class_stats": {c: {"correct": rng.randint(0, 200), "incorrect": rng.randint(0, 200)}
+                                for c in classes},
+                "overall": {"correct": rng.randint(0, 1000), "incorrect": rng.randint(0, 1000)},
+            }
+        results[f"2024-{1 + day // 28:02d}-{1 + day % 28:02d}"] = {
+            "student_results": student_results,
+            "section_statistics": section_statistics,
+        }
+    return {"results": results}
+
+
+def best_of(func, repeat: int) -> float:
+    """Return the fastest of `repeat` timed calls, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def materialize(results_json: dict) -> dict:
+    """Force every lazily decoded block, as converting to json does."""
+    return {"results": {
+        date: {"student_results": dict(data["student_results"]),
+               "section_statistics": dict(data["section_statistics"])}
+        for date, data in results_json["results"].items()
+    }}
+
+
+def lookup_student(results_json: dict, student_key: str) -> list:
+    """Collect one student's results, as view_previous_results does."""
+    return [data["student_results"][student_key] for data in results_json["results"].values()
+            if student_key in data["student_results"]]
+
+
+def section_statistics(results_json: dict) -> list:
+    """Touch every day's section statistics, as view_section_statistics does."""
+    return [dict(data["section_statistics"]) for data in results_json["results"].values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--students", type=int, default=200, help="students per day")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    history = build_history(args.days, args.students)
+    json_blob = json.dumps(history, indent=4, ensure_ascii=False).encode("utf-8")
+    compact_blob = encode_compact_results(history)
+    assert materialize(decode_compact_results(compact_blob)) == history, "compact format does not round-trip"
+    student_key = next(iter(next(iter(history["results"].values()))["student_results"]))
+
+    # Each row times what a caller pays end to end; compact blocks are decoded only when touched
+    rows = [
+        ("student lookup", lambda: lookup_student(json.loads(json_blob), student_key),
+         lambda: lookup_student(decode_compact_results(compact_blob), student_key)),
+        ("section stats", lambda: section_statistics(json.loads(json_blob)),
+         lambda: section_statistics(decode_compact_results(compact_blob))),
+        ("full decode", lambda: json.loads(json_blob), lambda: materialize(decode_compact_results(compact_blob))),
+    ]
+
+    codec = "zstd" if get_zstandard() is not None else "gzip"
+    print(f"History: {args.days} days x {args.students} students/day, compact codec: {codec}")
+    print(f"{'':<20}{'json':>12}{'compact':>12}{'ratio':>8}")
+    print(f"{'size (KiB)':<20}{len(json_blob) / 1024:>12.1f}{len(compact_blob) / 1024:>12.1f}"
+          f"{len(json_blob) / len(compact_blob):>7.1f}x")
+    for name, json_func, compact_func in rows:
+        json_time = best_of(json_func, args.repeat)
+        compact_time = best_of(compact_func, args.repeat)
+        print(f"{name + ' (ms)':<20}{json_time * 1000:>12.1f}{compact_time * 1000:>12.1f}"
+              f"{json_time / compact_time:>7.1f}x")
+    header_time = best_of(lambda: decode_compact_results(compact_blob), args.repeat)
+    print(f"(compact header only, no block decoded: {header_time * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Check the CLI's time-to-first-prompt and import profile against a budget.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget-ms MS]
+
+Exits non-zero if the median time to the first prompt exceeds the budget or a
+module that should be imported lazily is loaded before the first prompt.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_PROMPT = b"Choose an option (1 or 2): "
+DEFERRED_MODULES = ["argparse", "bcrypt", "dotenv", "gzip", "tabulate", "zstandard"]
+
+
+def run_until_prompt(extra_args: list) -> tuple:
+    """Start main.py, wait for the first prompt and return (seconds, stderr text)."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, *extra_args, "main.py"],
+        cwd=REPO_ROOT,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    output = b""
+    while not output.endswith(FIRST_PROMPT):
+        chunk = os.read(process.stdout.fileno(), 4096)
+        if not chunk:
+            raise RuntimeError(f"main.py exited before the first prompt:\n{output.decode(errors='replace')}")
+        output += chunk
+    elapsed = time.perf_counter() - start
+    _, stderr = process.communicate(input=b"")  # input() hits EOF and the process exits
+    return elapsed, stderr.decode(errors="replace")
+
+
+def parse_importtime(stderr: str) -> list:
+    """Return (name, depth, cumulative us) for every line of -X importtime output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name_field = line.split("|")
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        imports.append((name_field.strip(), depth, int(cumulative_us)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="median time-to-first-prompt budget")
+    args = parser.parse_args()
+
+    run_until_prompt([])  # Warm the .env snapshot and bytecode caches
+    timings = [run_until_prompt([])[0] for _ in range(args.runs)]
+    median_ms = statistics.median(timings) * 1000
+
+    _, stderr = run_until_prompt(["-X", "importtime"])
+    imports = parse_importtime(stderr)
+    loaded_names = {name.split(".")[0] for name, _, _ in imports}
+    loaded_deferred = [name for name in DEFERRED_MODULES if name in loaded_names]
+    top_level = [(name, us) for name, depth, us in imports if depth == 0]
+
+    print(f"time-to-first-prompt: median {median_ms:.1f} ms, min {min(timings) * 1000:.1f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print(f"imports: {sum(us for _, us in top_level) / 1000:.1f} ms in {len(imports)} modules")
+    print("slowest top-level imports (cumulative ms):")
+    for name, us in sorted(top_level, key=lambda item: item[1], reverse=True)[:8]:
+        print(f"  {name:<24}{us / 1000:>8.1f}")
+
+    failed = False
+    if loaded_deferred:
+        print(f"FAIL: imported before the first prompt: {', '.join(loaded_deferred)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: median {median_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,604 @@
+import bisect
 import json
 import random
+import sys
 import time
+from array import array
+from collections.abc import MutableMapping
 from datetime import datetime
+from operator import itemgetter
+from types import SimpleNamespace
 from typing import Dict, List, Union
 import os
 from dataclasses import dataclass, asdict
-import bcrypt
-from tabulate import tabulate
-from dotenv import load_dotenv 
 
-
-# Ortam değişkenlerini .env dosyasından yükle 
-load_dotenv()
+# bcrypt, tabulate, python-dotenv, gzip and zstandard are imported where they are
+# used so that reaching the first prompt does not pay for them.
+
+ENV_FILE = ".env"
+ENV_SNAPSHOT_FILE = ".env.snapshot.json"
+
+def load_env_snapshot(env_file: str = ENV_FILE) -> Dict[str, str]:
+    """Return the .env values, parsing with python-dotenv only when .env has changed."""
+    try:
+        env_stat = os.stat(env_file)
+    except FileNotFoundError:
+        return {}
+    signature = [env_stat.st_mtime_ns, env_stat.st_size]
+
+    try:
+        with open(ENV_SNAPSHOT_FILE, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+            if os.name == "posix" and os.fstat(f.fileno()).st_mode & 0o077:  # Eski sürümün herkesin okuyabildiği kopyası
+                os.chmod(ENV_SNAPSHOT_FILE, 0o600)
+        if snapshot["signature"] == signature:
+            return snapshot["values"]
+    except (OSError, json.JSONDecodeError, KeyError, TypeError):
+        pass
+
+    from dotenv import dotenv_values
+    values = {key: value for key, value in dotenv_values(env_file).items() if value is not None}
+    try:
+        # The snapshot holds secrets such as ENCRYPTION_KEY, so only the owner may read it
+        tmp_path = f"{ENV_SNAPSHOT_FILE}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.chmod(tmp_path, 0o600)  # O_CREAT keeps the mode of a leftover temp file
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump({"signature": signature, "values": values}, f)
+        os.replace(tmp_path, ENV_SNAPSHOT_FILE)
+    except OSError:
+        pass  # Yazılamıyorsa her açılışta .env yeniden okunur
+    return values
+
+
+# Ortam değişkenlerini .env dosyasından yükle (mevcut değişkenler ezilmez)
+for env_key, env_value in load_env_snapshot().items():
+    os.environ.setdefault(env_key, env_value)
 # Retrieve values from environment variables
 TIME_LIMIT = int(os.getenv("TIME_LIMIT", 300))  # Default to 300 seconds if not set
 ATTEMPT_LIMIT = int(os.getenv("ATTEMPT_LIMIT", 3))  # Default to 3 attempts if not set
 MAX_QUESTIONS_PER_SECTION = int(os.getenv("MAX_QUESTIONS_PER_SECTION", 5))  # Default to 5 questions
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
+DELTA_COMPACT_THRESHOLD = int(os.getenv("DELTA_COMPACT_THRESHOLD", 100))  # Edits kept in the delta log before compaction
+RESULTS_FORMAT = os.getenv("RESULTS_FORMAT", "json")  # "json" or "compact"
+
+SECTION_COUNT = 4
+RESULTS_FILES = {"json": "results/results.json", "compact": "results/results.qzr"}
+SCORE_INDEX_DIR = "results/score_index"
+SCHOOL_SCOPE = "*"  # Okul geneli; sınıf adlarıyla çakışmaz
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPACT_RESULTS_VERSION = 2
 
 # Helper functions
-def load_answer_keys() -> Dict:
-    """Load answer keys from answers.json."""
+def get_zstandard():
+    """Return the optional zstandard module, or None; compact results fall back to gzip."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+def question_file_path(section_number: int) -> str:
+    """Path of the section's question file."""
+    return f"questions/questions_section{section_number}.json"
+
+def question_delta_path(section_number: int) -> str:
+    """Path of the section's append-only edit log."""
+    return f"questions/questions_section{section_number}.delta.jsonl"
+
+def write_bytes_atomic(file_path: str, data: bytes):
+    """Write data to a temp file and move it over file_path in one step."""
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+def write_json_atomic(file_path: str, data: Dict, **dump_kwargs):
+    """Write JSON to a temp file and move it over file_path in one step."""
+    write_bytes_atomic(file_path, json.dumps(data, **dump_kwargs).encode('utf-8'))
+
+def read_question_deltas(section_number: int) -> List[Dict]:
+    """Read the committed edit records of a section's delta log."""
+    file_path = question_delta_path(section_number)
+    if not os.path.exists(file_path):
+        return []
+    records = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # Yarım kalmış yazma, commit edilmemiş kabul edilir
+    return records
+
+def append_question_delta(section_number: int, record: Dict):
+    """Commit one edit record (question + answer key) to the section's delta log."""
+    file_path = question_delta_path(section_number)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'a+b') as f:
+        # Isolate a torn trailing write so it cannot swallow this record
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+
+def load_answer_keys(section_numbers: List[int] = None) -> Dict:
+    """Load answer keys from answers.json, including uncompacted edits of section_numbers (default: all)."""
     file_path = "answers/answers.json"
+    answer_keys = {"answers": {}}
     if os.path.exists(file_path):
         with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {"answers": {}}
+            answer_keys = json.load(f)
+
+    for section_number in section_numbers or range(1, SECTION_COUNT + 1):
+        for record in read_question_deltas(section_number):
+            section_answers = answer_keys["answers"].setdefault(f"section{section_number}", {})
+            section_answers[str(record["question"]["id"])] = record["answers"]
+    return answer_keys
 
 def save_answer_keys(answer_keys: Dict):
     """Save answer keys to answers.json."""
     os.makedirs("answers", exist_ok=True)
-    with open("answers/answers.json", 'w', encoding='utf-8') as f:
-        json.dump(answer_keys, f, indent=4, ensure_ascii=False)
+    write_json_atomic("answers/answers.json", answer_keys, indent=4, ensure_ascii=False)
+
+class _CompactTables:
+    """String tables shared by every day of a compact results file; codes are append-only."""
+    def __init__(self, students: List = None, classes: List = None, labels: List = None):
+        self.students = students if students is not None else []  # Stores [student_key, name, surname]
+        self.classes = classes if classes is not None else []
+        self.labels = labels if labels is not None else []  # Section labels ("Section 1") and statuses
+        self._codes = {}  # Value -> code lookups, built on first use
+        self._student_codes = None  # Stores {student_key: [codes]}, one code per spelling of the name
+
+    def _lookup(self, table_name: str) -> Dict:
+        if table_name not in self._codes:
+            table = getattr(self, table_name)
+            if table_name == "students":  # Aynı anahtar farklı yazılışlarla kaydedilmiş olabilir
+                self._codes[table_name] = {tuple(student): code for code, student in enumerate(table)}
+            else:
+                self._codes[table_name] = {item: code for code, item in enumerate(table)}
+        return self._codes[table_name]
+
+    def _code(self, table_name: str, key, value) -> int:
+        codes = self._lookup(table_name)
+        if key not in codes:
+            table = getattr(self, table_name)
+            codes[key] = len(table)
+            table.append(value)
+            if table_name == "students" and self._student_codes is not None:
+                self._student_codes.setdefault(value[0], []).append(codes[key])
+        return codes[key]
+
+    def student(self, student_key: str, name: str, surname: str) -> int:
+        return self._code("students", (student_key, name, surname), [student_key, name, surname])
+
+    def class_id(self, class_name: Union[str, None]) -> int:
+        return self._code("classes", class_name, class_name)
+
+    def label_id(self, label: str) -> int:
+        return self._code("labels", label, label)
+
+    def student_codes(self, student_key: str) -> List[int]:
+        """Codes recorded for student_key; empty if it was never recorded."""
+        if self._student_codes is None:
+            self._student_codes = {}
+            for code, student in enumerate(self.students):
+                self._student_codes.setdefault(student[0], []).append(code)
+        return self._student_codes.get(student_key, [])
+
+
+class _CompactBlock(MutableMapping):
+    """Dict view over one encoded block of a compact results file, decoded on first use."""
+    def __init__(self, tables: _CompactTables, raw: bytes):
+        self._tables = tables
+        self._raw = raw
+        self._data = None
+
+    def _materialize(self) -> Dict:
+        if self._data is None:
+            self._data = self._decode(self._raw)
+            self._raw = None
+        return self._data
+
+    def raw_for(self, tables: _CompactTables) -> Union[bytes, None]:
+        """Encoded block, if it is untouched and its codes are valid in tables."""
+        return self._raw if self._data is None and tables is self._tables else None
+
+    def __getitem__(self, key):
+        data = self._data if self._data is not None else self._materialize()
+        return data[key]
+
+    def __setitem__(self, key, value):
+        self._materialize()[key] = value
+
+    def __delitem__(self, key):
+        del self._materialize()[key]
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __len__(self):
+        return len(self._materialize())
+
+    def items(self):
+        return self._materialize().items()
+
+    def values(self):
+        return self._materialize().values()
+
+
+class _CompactStudentResults(_CompactBlock):
+    def __init__(self, tables: _CompactTables, raw: bytes, student_ids: List[int]):
+        super().__init__(tables, raw)
+        self.student_ids = student_ids
+        self._student_id_set = None  # Üyelik sorguları için ilk kullanımda kurulur
+
+    def _decode(self, raw: bytes) -> Dict:
+        class_ids, status_ids, label_patterns, pattern_ids, int_positions = json.loads(_block_columns(raw))
+        scores = _unpack_scores(raw, int_positions)
+        students, classes, labels = self._tables.students, self._tables.classes, self._tables.labels
+        pattern_labels = [[labels[label_id] for label_id in pattern] for pattern in label_patterns]
+
+        student_results = {}
+        position = len(self.student_ids)  # Genel puanlardan sonra bölüm puanları gelir
+        for student_id, class_id, status_id, pattern_id, overall_score in zip(
+                self.student_ids, class_ids, status_ids, pattern_ids, scores):
+            student_key, name, surname = students[student_id]
+            section_labels = pattern_labels[pattern_id]
+            end = position + len(section_labels)
+            student_results[student_key] = {
+                "name": name,
+                "surname": surname,
+                "class": classes[class_id],
+                "section_scores": dict(zip(section_labels, scores[position:end])),
+                "overall_score": overall_score,
+                "status": labels[status_id],
+            }
+            position = end
+        return student_results
+
+    def __contains__(self, key):
+        if self._data is None:  # Blok çözülmeden öğrenci indeksinden cevapla
+            if self._student_id_set is None:
+                self._student_id_set = set(self.student_ids)
+            return any(code in self._student_id_set for code in self._tables.student_codes(key))
+        return key in self._data
+
+    def __getitem__(self, key):
+        if self._data is None:
+            if key not in self:
+                raise KeyError(key)
+            self._materialize()
+        return self._data[key]
+
+
+class _CompactSectionStatistics(_CompactBlock):
+    def _decode(self, raw: bytes) -> Dict:
+        classes = self._tables.classes
+        rows = json.loads(raw)
+        return {
+            section_number: {
+                "question_stats": {q: {"correct": c, "incorrect": i} for q, c, i in question_rows},
+                "class_stats": {classes[k]: {"correct": c, "incorrect": i} for k, c, i in class_rows},
+                "overall": {"correct": correct, "incorrect": incorrect},
+            }
+            for section_number, question_rows, class_rows, (correct, incorrect) in rows
+        }
+
+
+def _block_columns(raw: bytes) -> bytes:
+    """JSON column part of a student block."""
+    return raw[4:4 + int.from_bytes(raw[:4], "big")]
+
+def _unpack_scores(raw: bytes, int_positions: List[int]) -> List:
+    """Scores stored after a student block's columns as little-endian float64."""
+    scores = array("d")
+    scores.frombytes(raw[4 + int.from_bytes(raw[:4], "big"):])
+    if sys.byteorder == "big":
+        scores.byteswap()
+    scores = scores.tolist()
+    for position in int_positions:  # Tam sayı olarak kaydedilmiş puanlar (ör. 0) korunur
+        scores[position] = int(scores[position])
+    return scores
+
+def _encode_student_results(tables: _CompactTables, student_results: Dict) -> tuple:
+    """Encode one day's student results as (student_ids, block).
+
+    The block is column-oriented: a length-prefixed JSON list of class, status
+    and section-label codes, followed by every overall score and then every
+    section score as packed float64, which decodes much faster than JSON floats.
+    """
+    student_ids, class_ids, status_ids, pattern_ids = [], [], [], []
+    label_patterns, pattern_codes = [], {}  # Stores each distinct sequence of section label codes
+    overall_scores, section_scores = [], []
+    for student_key, result in student_results.items():
+        student_ids.append(tables.student(student_key, result["name"], result["surname"]))
+        class_ids.append(tables.class_id(result["class"]))
+        status_ids.append(tables.label_id(result["status"]))
+        pattern = tuple(tables.label_id(section) for section in result["section_scores"])
+        if pattern not in pattern_codes:
+            pattern_codes[pattern] = len(label_patterns)
+            label_patterns.append(pattern)
+        pattern_ids.append(pattern_codes[pattern])
+        overall_scores.append(result["overall_score"])
+        section_scores.extend(result["section_scores"].values())
+
+    scores = overall_scores + section_scores
+    int_positions = [position for position, score in enumerate(scores) if isinstance(score, int)]
+    columns = json.dumps([class_ids, status_ids, label_patterns, pattern_ids, int_positions],
+                         separators=(",", ":")).encode('utf-8')
+    packed_scores = array("d", scores)
+    if sys.byteorder == "big":
+        packed_scores.byteswap()
+    return student_ids, len(columns).to_bytes(4, "big") + columns + packed_scores.tobytes()
+
+def _encode_section_statistics(tables: _CompactTables, section_statistics: Dict) -> List:
+    rows = []
+    for section_number, section_data in section_statistics.items():
+        overall = section_data.get("overall", {})
+        rows.append([
+            section_number,
+            [[question_id, stats["correct"], stats["incorrect"]]
+             for question_id, stats in section_data.get("question_stats", {}).items()],
+            [[tables.class_id(class_name), stats["correct"], stats["incorrect"]]
+             for class_name, stats in section_data.get("class_stats", {}).items()],
+            [overall.get("correct", 0), overall.get("incorrect", 0)],
+        ])
+    return rows
+
+def encode_compact_results(results_json: Dict) -> bytes:
+    """Encode results with dictionary-coded keys, students and classes, then compress.
+
+    The payload is a length-prefixed JSON header (string tables and, per day,
+    the student ids plus block offsets) followed by the raw day blocks; days
+    loaded from a compact file and left untouched are copied as is.
+    """
+    tables = next(
+        (day["student_results"]._tables for day in results_json["results"].values()
+         if isinstance(day.get("student_results"), _CompactBlock)),
+        None,
+    ) or _CompactTables()
+
+    dates = {}
+    blocks = []
+    offset = 0
+    for date, data in results_json["results"].items():
+        student_results = data.get("student_results", {})
+        section_statistics = data.get("section_statistics", {})
+
+        student_raw = student_results.raw_for(tables) if isinstance(student_results, _CompactBlock) else None
+        if student_raw is not None:
+            student_ids = student_results.student_ids
+        else:
+            student_ids, student_raw = _encode_student_results(tables, student_results)
+
+        section_raw = section_statistics.raw_for(tables) if isinstance(section_statistics, _CompactBlock) else None
+        if section_raw is None:
+            section_raw = json.dumps(_encode_section_statistics(tables, section_statistics),
+                                     separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+
+        dates[date] = [student_ids, offset, len(student_raw), len(section_raw)]
+        if "revision" in data:
+            dates[date].append(data["revision"])
+        blocks += [student_raw, section_raw]
+        offset += len(student_raw) + len(section_raw)
+
+    header = json.dumps(
+        {"v": COMPACT_RESULTS_VERSION, "students": tables.students, "classes": tables.classes, "labels": tables.labels, "dates": dates},
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode('utf-8')
+    payload = b"".join([len(header).to_bytes(4, "big"), header] + blocks)
+    zstandard = get_zstandard()
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10, write_checksum=True).compress(payload)
+    import gzip
+    return gzip.compress(payload, compresslevel=6)
+
+def decode_compact_results(blob: bytes) -> Dict:
+    """Decode a compact results blob into the results.json structure.
+
+    Per-day blocks are decoded lazily, so looking a student up only parses the
+    days that student appears in.
+    """
+    if blob[:4] == ZSTD_MAGIC:
+        zstandard = get_zstandard()
+        if zstandard is None:
+            raise RuntimeError("Results file is zstd-compressed; install 'zstandard' to read it.")
+        payload = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        import gzip
+        payload = gzip.decompress(blob)
+    header_end = 4 + int.from_bytes(payload[:4], "big")
+    header = json.loads(payload[4:header_end])
+    if header["v"] != COMPACT_RESULTS_VERSION:
+        raise ValueError(f"unsupported compact results version {header['v']}")
+
+    tables = _CompactTables(header["students"], header["classes"], header["labels"])
+    results = {}
+    for date, (student_ids, offset, student_len, section_len, *revision) in header["dates"].items():
+        start = header_end + offset
+        results[date] = {
+            "student_results": _CompactStudentResults(tables, payload[start:start + student_len], student_ids),
+            "section_statistics": _CompactSectionStatistics(
+                tables, payload[start + student_len:start + student_len + section_len]
+            ),
+        }
+        if revision:
+            results[date]["revision"] = revision[0]
+    return {"results": results}
+
+class CorruptResultsError(Exception):
+    """Raised when a stored results file cannot be decoded."""
+
+
+def _results_decode_errors() -> tuple:
+    """Exception types raised by a damaged results file (evaluated only on error)."""
+    import zlib
+    errors = (ValueError, KeyError, TypeError, IndexError, OSError, EOFError, zlib.error)
+    zstandard = get_zstandard()
+    return errors + (zstandard.ZstdError,) if zstandard is not None else errors
+
+def _other_results_format(results_format: str) -> str:
+    return "json" if results_format == "compact" else "compact"
+
+def load_results(results_format: str = RESULTS_FORMAT) -> Dict:
+    """Load the results history.
+
+    The other format's file is only read when results_format has no file yet;
+    a file that exists but cannot be decoded raises CorruptResultsError.
+    """
+    file_path = RESULTS_FILES[results_format]
+    if not os.path.exists(file_path):
+        file_path = RESULTS_FILES[_other_results_format(results_format)]
+        if not os.path.exists(file_path):
+            return {"results": {}}
+        results_format = _other_results_format(results_format)
+
+    try:
+        if results_format == "compact":
+            with open(file_path, 'rb') as f:
+                return decode_compact_results(f.read())
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except _results_decode_errors() as exc:
+        raise CorruptResultsError(f"{file_path} is corrupt: {exc}") from exc
+
+def save_results_file(results_json: Dict, results_format: str = RESULTS_FORMAT):
+    """Write the results history in the given format.
+
+    Any file in the other format is superseded and renamed to *.bak so that the
+    two histories cannot drift apart.
+    """
+    os.makedirs("results", exist_ok=True)
+    file_path = RESULTS_FILES[results_format]
+    if results_format == "compact":
+        write_bytes_atomic(file_path, encode_compact_results(results_json))
+    else:
+        write_json_atomic(file_path, results_json, indent=4, ensure_ascii=False, default=dict)
+
+    other_path = RESULTS_FILES[_other_results_format(results_format)]
+    if os.path.exists(other_path):
+        os.replace(other_path, f"{other_path}.bak")
+
+def convert_results(target_format: str):
+    """Rewrite the stored results history in target_format; the source is kept as *.bak."""
+    source_format = _other_results_format(target_format)
+    source_path = RESULTS_FILES[source_format]
+    if not os.path.exists(source_path):
+        print(f"No {source_format} results file to convert.")
+        return
+    try:
+        results_json = load_results(source_format)
+    except CorruptResultsError as exc:
+        print(f"Conversion aborted: {exc}")
+        return
+    save_results_file(results_json, target_format)
+    print(f"Converted {source_path} -> {RESULTS_FILES[target_format]} (original kept as {source_path}.bak)")
+
+class ScoreIndex:
+    """Sorted score lists for one date, per class and metric, for rank, percentile and top-k queries.
+
+    Stored in results/score_index/<date>.json as {scope: {metric: [[score, student_key], ...]}},
+    where scope is a class name or SCHOOL_SCOPE and metric is "overall" or a section
+    label ("Section 1"), next to the revision of the day's results it reflects.
+    save_results bumps the day's "revision" on every save.
+    """
+    def __init__(self, date: str, scopes: Dict = None):
+        self.date = date
+        self.scopes = scopes if scopes is not None else {}
+
+    @staticmethod
+    def file_path(date: str) -> str:
+        return os.path.join(SCORE_INDEX_DIR, f"{date}.json")
+
+    @classmethod
+    def load(cls, date: str, day_results: Dict) -> "ScoreIndex":
+        """Load the date's index, rebuilding it from day_results if it is missing or stale."""
+        revision = day_results.get("revision", 0)
+        try:
+            with open(cls.file_path(date), 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored["revision"] == revision:
+                return cls(date, stored["scopes"])
+        except (OSError, json.JSONDecodeError, KeyError, TypeError):
+            pass
+
+        index = cls(date)
+        for student_key, result in day_results.get("student_results", {}).items():
+            index.add(student_key, result)
+        try:
+            index.save(revision)
+        except OSError:
+            pass  # Yazılamıyorsa yeniden kurulan indeks yine de kullanılır
+        return index
+
+    def save(self, revision: int):
+        """Write the index, tagged with the revision of the day's results it now reflects."""
+        os.makedirs(SCORE_INDEX_DIR, exist_ok=True)
+        write_json_atomic(
+            self.file_path(self.date),
+            {"revision": revision, "scopes": self.scopes},
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+
+    @staticmethod
+    def _metrics(result: Dict) -> Dict[str, float]:
+        return {"overall": result["overall_score"], **result["section_scores"]}
+
+    def entries(self, scope: str, metric: str) -> List:
+        """Sorted [score, student_key] pairs; empty if nothing was recorded."""
+        return self.scopes.get(scope, {}).get(metric, [])
+
+    def add(self, student_key: str, result: Dict):
+        """Index a student_results record."""
+        for scope in (SCHOOL_SCOPE, result["class"] or "Unknown"):
+            metrics = self.scopes.setdefault(scope, {})
+            for metric, score in self._metrics(result).items():
+                bisect.insort(metrics.setdefault(metric, []), [score, student_key])
+
+    def remove(self, student_key: str, result: Dict):
+        """Drop a previously indexed student_results record."""
+        for scope in (SCHOOL_SCOPE, result["class"] or "Unknown"):
+            for metric, score in self._metrics(result).items():
+                entries = self.entries(scope, metric)
+                position = bisect.bisect_left(entries, [score, student_key])
+                if position < len(entries) and entries[position] == [score, student_key]:
+                    del entries[position]
+
+    def top_k(self, scope: str, metric: str, k: int) -> List:
+        """Highest k [score, student_key] pairs, best first."""
+        entries = self.entries(scope, metric)
+        return entries[:-k - 1:-1] if k > 0 else []
+
+    def rank(self, scope: str, metric: str, score: float) -> int:
+        """1-based rank of score; ties share the best rank."""
+        entries = self.entries(scope, metric)
+        return len(entries) - bisect.bisect_right(entries, score, key=itemgetter(0)) + 1
+
+    def percentile(self, scope: str, metric: str, score: float) -> float:
+        """Percentage of indexed scores at or below score."""
+        entries = self.entries(scope, metric)
+        if not entries:
+            return 0.0
+        return bisect.bisect_right(entries, score, key=itemgetter(0)) / len(entries) * 100
+
+    def histogram(self, scope: str, metric: str, bin_width: int = 10) -> List:
+        """[label, count] per score band of bin_width; the last band includes 100."""
+        entries = self.entries(scope, metric)
+        edges = list(range(0, 100, bin_width)) + [100]
+        counts = [bisect.bisect_left(entries, edge, key=itemgetter(0)) for edge in edges[1:-1]] + [len(entries)]
+        histogram, previous = [], 0
+        for low, high, count in zip(edges, edges[1:], counts):
+            histogram.append([f"{low}-{high}", count - previous])
+            previous = count
+        return histogram
 
 
 
@@ -58,18 +625,89 @@ class User:
 class QuizSection:
     def __init__(self, section_number: int):
         self.section_number = section_number
-        self.questions = self.load_questions()
+        self.question_index = {}  # Stores {question_id: position in self.questions}
+        self.next_question_id = 1
+        self.pending_edits = 0  # Delta log records not yet compacted
+        self._questions = None  # Soru dosyası ilk kullanımda okunur
         self.current_questions = []
         self.user_answers = {}  # Stores {question_id: answer}
         self.score = 0
         self.max_questions_per_section = MAX_QUESTIONS_PER_SECTION
-    
+
+    @property
+    def questions(self) -> List[Question]:
+        """Questions of the section, read from disk on first use."""
+        self._ensure_loaded()
+        return self._questions
+
+    def _ensure_loaded(self):
+        """Read the section file and replay its delta log if not done yet."""
+        if self._questions is None:
+            self._questions = self.load_questions()
+
     def load_questions(self) -> List[Question]:
-        """Load questions from JSON."""
-        file_path = f"questions/questions_section{self.section_number}.json"
-        with open(file_path, 'r', encoding='utf-8') as f:
-            questions_data = json.load(f)["questions"]
-        return [Question(**question_data) for question_data in questions_data]
+        """Load questions from JSON and replay the section's delta log."""
+        with open(question_file_path(self.section_number), 'r', encoding='utf-8') as f:
+            section_data = json.load(f)
+        questions = [Question(**question_data) for question_data in section_data["questions"]]
+
+        self.question_index = {q.id: position for position, q in enumerate(questions)}
+        self.next_question_id = max([section_data.get("next_id", 1)] + [q.id + 1 for q in questions])
+
+        deltas = read_question_deltas(self.section_number)
+        for record in deltas:
+            self._apply_question(questions, Question(**record["question"]))
+        self.pending_edits = len(deltas)
+        return questions
+
+    def _apply_question(self, questions: List[Question], question: Question):
+        """Insert or replace a question in place, keeping the id index current."""
+        position = self.question_index.get(question.id)
+        if position is None:
+            self.question_index[question.id] = len(questions)
+            questions.append(question)
+        else:
+            questions[position] = question
+        self.next_question_id = max(self.next_question_id, question.id + 1)
+
+    def get_question(self, question_id: int) -> Union[Question, None]:
+        """Look up a question by id."""
+        self._ensure_loaded()
+        position = self.question_index.get(question_id)
+        return self._questions[position] if position is not None else None
+
+    def allocate_question_id(self) -> int:
+        """Return a fresh question id; ids are never reused."""
+        self._ensure_loaded()
+        question_id = self.next_question_id
+        self.next_question_id += 1
+        return question_id
+
+    def commit_question(self, question: Question, correct_answers: List[str]):
+        """Record a question and its answer key as a single delta log entry."""
+        self._ensure_loaded()  # Önce yüklenmezse yeni kayıt replay ile iki kez sayılır
+        append_question_delta(self.section_number, {"question": asdict(question), "answers": correct_answers})
+        self._apply_question(self._questions, question)
+        self.pending_edits += 1
+        if self.pending_edits >= DELTA_COMPACT_THRESHOLD:
+            self.compact_questions()
+
+    def compact_questions(self):
+        """Fold the delta log into the section file and answers.json."""
+        self._ensure_loaded()
+        answer_keys = load_answer_keys([self.section_number])  # Yalnızca bu bölümün log'u katlanır
+        questions_data = {
+            "next_id": self.next_question_id,
+            "questions": [asdict(q) for q in self._questions],
+        }
+        write_json_atomic(question_file_path(self.section_number), questions_data, indent=4)
+        save_answer_keys(answer_keys)
+
+        # Log replay is idempotent, so it is only dropped once both files are in place
+        delta_path = question_delta_path(self.section_number)
+        if os.path.exists(delta_path):
+            os.remove(delta_path)
+        self.pending_edits = 0
 
     def select_random_questions(self):
         """Randomly select questions for the section."""
@@ -112,13 +750,14 @@ class QuizSection:
 
     
 class QuizManager:
-    def __init__(self):
-        self.sections = [QuizSection(i) for i in range(1, 5)]
+    def __init__(self, results_format: str = RESULTS_FORMAT):
+        self.sections = [QuizSection(i) for i in range(1, SECTION_COUNT + 1)]
         self.user = None
         self.time_limit = TIME_LIMIT
         self.attempt_limit = ATTEMPT_LIMIT
         self.start_time = None
         self.results = {}
+        self.results_format = results_format
 
     def signup(self) -> bool:
         """Sign up a new user."""
@@ -133,6 +772,7 @@ class QuizManager:
             else:
                 print("Invalid role. Please enter 'teacher' or 'student'.")
 
+        import bcrypt
         hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
         user_data = self.load_user_data()
         user_key = f"{name.lower()}_{surname.lower()}"
@@ -193,6 +833,7 @@ class QuizManager:
             print("User does not exist. Please sign up.")
             return False
 
+        import bcrypt
         user_dict = user_data["users"][user_key]
         if not bcrypt.checkpw(password.encode('utf-8'), user_dict["hashed_password"].encode('utf-8')):
             print("Incorrect password. Please try again.")
@@ -228,9 +869,6 @@ class QuizManager:
         print("2. Update Existing Question")
         choice = input("Choose an option (1 or 2): ").strip()
 
-        answer_keys = load_answer_keys()
-        section_answers = answer_keys["answers"].setdefault(f"section{section_number}", {})
-
         if choice == "1":
             question_text = input("Enter the question text: ").strip()
             options = input("Enter the options (comma-separated): ").strip().split(",")
@@ -239,51 +877,43 @@ class QuizManager:
             question_type = input("Enter the question type (true_false, single_choice, multiple_choice): ").strip()
 
             new_question = Question(
-                id=len(section.questions) + 1,
+                id=section.allocate_question_id(),
                 text=question_text,
                 options=options,
                 points=points,
                 type=question_type
             )
-            section.questions.append(new_question)
-            section_answers[str(new_question.id)] = correct_answers
+            section.commit_question(new_question, correct_answers)
             print("Question and answer key added successfully!")
 
         elif choice == "2":
             for q in section.questions:
                 print(f"{q.id}. {q.text}")
             question_id = int(input("Enter the question ID to update: ").strip())
-            question = next((q for q in section.questions if q.id == question_id), None)
+            question = section.get_question(question_id)
             if not question:
                 print("Invalid question ID.")
                 return
 
-            question.text = input(f"Enter the new text (current: {question.text}): ").strip() or question.text
-            question.options = input(f"Enter the new options (current: {','.join(question.options)}): ").strip().split(",") or question.options
+            text = input(f"Enter the new text (current: {question.text}): ").strip() or question.text
+            options = input(f"Enter the new options (current: {','.join(question.options)}): ").strip().split(",") or question.options
             correct_answers = input(f"Enter the new correct answers: ").strip().split(",")
-            question.points = int(input(f"Enter the new points (current: {question.points}): ").strip() or question.points)
+            points = int(input(f"Enter the new points (current: {question.points}): ").strip() or question.points)
 
-            section_answers[str(question.id)] = correct_answers
+            updated_question = Question(
+                id=question.id,
+                text=text,
+                options=options,
+                points=points,
+                type=question.type
+            )
+            section.commit_question(updated_question, correct_answers)
             print("Question and answer key updated successfully!")
 
-        # Save questions to the JSON file
-        self.save_questions(section_number)
-
-        # Save the updated answer keys
-        save_answer_keys(answer_keys)
-
 
     def save_questions(self, section_number: int):
         """Soruları JSON dosyasına kaydet."""
-        section = self.sections[section_number - 1]
-        file_path = f"questions/questions_section{section_number}.json"
-
-        questions_data = {
-            "questions": [asdict(q) for q in section.questions]
-        }
-
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(questions_data, f, indent=4)
+        self.sections[section_number - 1].compact_questions()
         print(f"Section {section_number} questions saved successfully!")
 
     def signin_student(self):
@@ -309,7 +939,8 @@ class QuizManager:
         while True:
             print("\n1. View Section Statistics")
             print("2. Add/Update Questions")
-            print("3. Logout")
+            print("3. View Leaderboard")
+            print("4. Logout")
             choice = input("Choose an option: ").strip()
 
             if choice == "1":
@@ -317,6 +948,8 @@ class QuizManager:
             elif choice == "2":
                 self.add_or_update_question(self.user.assigned_section)
             elif choice == "3":
+                self.view_leaderboard(self.user.assigned_section)
+            elif choice == "4":
                 print("Logged out successfully.")
                 break
             else:
@@ -324,15 +957,17 @@ class QuizManager:
     
     def view_section_statistics(self, section_number: int):
         """Display detailed statistics for the given section, including class-wise comparisons."""
-        results_file = "results/results.json"
+        from tabulate import tabulate
 
-        if not os.path.exists(results_file):
+        try:
+            results_data = load_results(self.results_format)
+        except CorruptResultsError as exc:
+            print(f"Results could not be read: {exc}")
+            return
+        if not results_data["results"]:
             print("No results available.")
             return
 
-        with open(results_file, 'r', encoding='utf-8') as f:
-            results_data = json.load(f)
-
         cumulative_question_stats = {}
         cumulative_class_stats = {}
 
@@ -403,6 +1038,51 @@ class QuizManager:
         print(tabulate(class_table, headers=["Class", "Correct", "Incorrect", "Success Rate"], tablefmt="grid"))
 
 
+    def view_leaderboard(self, section_number: int, top_k: int = 10):
+        """Display the top students and score distribution of a class or the whole school."""
+        from tabulate import tabulate
+
+        try:
+            results_data = load_results(self.results_format)
+        except CorruptResultsError as exc:
+            print(f"Results could not be read: {exc}")
+            return
+        if not results_data["results"]:
+            print("No results available.")
+            return
+
+        latest_date = max(results_data["results"])
+        date = input(f"Enter date (YYYY-MM-DD, default {latest_date}): ").strip() or latest_date
+        if date not in results_data["results"]:
+            print("No results for that date.")
+            return
+        class_name = input("Enter class (leave blank for whole school): ").strip()
+        scope = class_name or SCHOOL_SCOPE
+        section = f"Section {section_number}"
+
+        student_results = results_data["results"][date]["student_results"]
+        score_index = ScoreIndex.load(date, results_data["results"][date])
+        leaderboard_table = []
+        for score, student_key in score_index.top_k(scope, section, top_k):
+            result = student_results.get(student_key, {})
+            leaderboard_table.append([
+                score_index.rank(scope, section, score),
+                f"{result.get('name', '')} {result.get('surname', '')}".strip() or student_key,
+                result.get("class") or "N/A",
+                f"{score:.2f}",
+                f"{score_index.percentile(scope, section, score):.1f}",
+            ])
+
+        if not leaderboard_table:
+            print("No results for that class.")
+            return
+
+        print(f"\n--- {section} Leaderboard ({class_name or 'School'}, {date}) ---")
+        print(tabulate(leaderboard_table, headers=["Rank", "Student", "Class", "Score", "Percentile"], tablefmt="grid"))
+
+        print("\n--- Score Distribution ---")
+        print(tabulate(score_index.histogram(scope, section), headers=["Score", "Students"], tablefmt="grid"))
+
     def load_user_data(self) -> Dict:
         """Load user data from a JSON file."""
         try:
@@ -496,14 +1176,17 @@ class QuizManager:
 
     def view_previous_results(self):
         """Display the user's previous quiz results in a tabular format."""
-        results_file = "results/results.json"
-        if not os.path.exists(results_file):
+        from tabulate import tabulate
+
+        try:
+            results_data = load_results(self.results_format)
+        except CorruptResultsError as exc:
+            print(f"Results could not be read: {exc}")
+            return
+        if not results_data["results"]:
             print("No results found.")
             return
 
-        with open(results_file, 'r', encoding='utf-8') as f:
-            results_data = json.load(f)
-
         student_key = f"{self.user.name.lower()}_{self.user.surname.lower()}"
         found_results = False
 
@@ -517,7 +1200,10 @@ class QuizManager:
 
                 # Prepare table data for section scores
 
-                headers = ["Section", "Correct", "Wrong", "Class Average", "School Average", "Score", "Comparison"]
+                headers = ["Section", "Correct", "Wrong", "Class Average", "School Average", "Score", "Comparison",
+                           "Class Rank", "School Percentile"]
+                class_scope = student_results['class'] or "Unknown"
+                score_index = ScoreIndex.load(date, data)
 
                 table_data = []
                 for section, score in student_results['section_scores'].items():
@@ -547,6 +1233,10 @@ class QuizManager:
                     # Kullanıcı performans karşılaştırması
                     comparison = "Above Average" if score > class_average else "Below Average"
 
+                    # Sıralama ve yüzdelik dilim skor indeksinden okunur
+                    class_rank = score_index.rank(class_scope, section, score)
+                    class_size = len(score_index.entries(class_scope, section))
+                    school_percentile = score_index.percentile(SCHOOL_SCOPE, section, score)
 
                     row = [
                         section,
@@ -556,8 +1246,9 @@ class QuizManager:
                         round(school_average, 2),
 
                         f"{score:.2f}",
-                        comparison
-
+                        comparison,
+                        f"{class_rank}/{class_size}",
+                        f"{school_percentile:.1f}",
                     ]
                     table_data.append(row)
 
@@ -565,8 +1256,12 @@ class QuizManager:
                 print(tabulate(table_data, headers=headers, tablefmt="grid"))
 
                 # Overall Score and Status
-                print(f"\nOverall Score: {round(student_results['overall_score'], 2)}%")
+                overall_score = student_results['overall_score']
+                print(f"\nOverall Score: {round(overall_score, 2)}%")
                 print(f"Status: {student_results['status']}")
+                print(f"Class Rank: {score_index.rank(class_scope, 'overall', overall_score)}"
+                      f"/{len(score_index.entries(class_scope, 'overall'))}")
+                print(f"School Percentile: {score_index.percentile(SCHOOL_SCOPE, 'overall', overall_score):.1f}")
 
         if not found_results:
             print("\nNo previous results found.")
@@ -648,15 +1343,12 @@ class QuizManager:
 
     def save_results(self, overall_score=0):
 
-        results_file = "results/results.json"
-        if not os.path.exists("results"):
-            os.makedirs("results")
-
         try:
-            with open(results_file, 'r', encoding='utf-8') as f:
-                results_json = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            results_json = {"results": {}}
+            results_json = load_results(self.results_format)
+        except CorruptResultsError as exc:
+            # Bozuk geçmişin üzerine yazmak veriyi kaybettirir
+            print(f"Results were not saved: {exc}")
+            return
 
         date_key = datetime.now().strftime("%Y-%m-%d")
         if date_key not in results_json["results"]:
@@ -666,7 +1358,12 @@ class QuizManager:
             }
 
         student_key = f"{self.user.name.lower()}_{self.user.surname.lower()}"
-        results_json["results"][date_key]["student_results"][student_key] = {
+        day_results = results_json["results"][date_key]
+        student_results = day_results["student_results"]
+        score_index = ScoreIndex.load(date_key, day_results)
+        if student_key in student_results:  # Aynı gün tekrar girildiyse eski skor indeksten çıkarılır
+            score_index.remove(student_key, student_results[student_key])
+        student_results[student_key] = {
             "name": self.user.name,
             "surname": self.user.surname,
             "class": self.user.user_class,
@@ -674,8 +1371,10 @@ class QuizManager:
             "overall_score": overall_score,
             "status": "PASSED" if overall_score >= 75 else "FAILED"
         }
+        score_index.add(student_key, student_results[student_key])
 
         section_statistics = results_json["results"][date_key]["section_statistics"]
+        answer_keys = load_answer_keys()  # Delta log'lar soru başına değil bir kez okunur
         for section, score in self.results.items():
             section_number = section.split()[-1]  # "Section 1" -> "1"
             section_data = section_statistics.setdefault(section_number, {
@@ -686,7 +1385,7 @@ class QuizManager:
 
             for question_id, user_answer in self.sections[int(section_number) - 1].user_answers.items():
                 question_stats = section_data["question_stats"].setdefault(question_id, {"correct": 0, "incorrect": 0})
-                correct_answers = load_answer_keys()["answers"][f"section{section_number}"].get(question_id, [])
+                correct_answers = answer_keys["answers"][f"section{section_number}"].get(question_id, [])
 
                 if isinstance(user_answer, list):
                     correct = len(set(map(str, user_answer)) & set(map(str, correct_answers))) == len(correct_answers)
@@ -705,8 +1404,9 @@ class QuizManager:
             class_stats["correct"] = section_data["overall"]["correct"]
             class_stats["incorrect"] = section_data["overall"]["incorrect"]
 
-        with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump(results_json, f, indent=4, ensure_ascii=False)
+        day_results["revision"] = day_results.get("revision", 0) + 1
+        save_results_file(results_json, self.results_format)
+        score_index.save(day_results["revision"])  # Sonuç dosyası yazıldıktan sonra
 
         print("Results saved successfully.")
 
@@ -730,12 +1430,29 @@ class QuizManager:
             class_stats["incorrect"] = section_data["overall"]["incorrect"]
 
         # Dosyayı kaydet
-        with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump(results_json, f, indent=4, ensure_ascii=False)
+        save_results_file(results_json, self.results_format)
 
         print("Results saved successfully.")
 
 
+def parse_args(argv: List[str]):
+    """Parse command-line options; argparse is only imported when options are given."""
+    if not argv:  # Seçeneksiz açılış (laboratuvar varsayılanı) argparse yüklemez
+        return SimpleNamespace(format=RESULTS_FORMAT, convert_results=None)
+    import argparse
+    parser = argparse.ArgumentParser(description="Multi-Section Quiz Application")
+    parser.add_argument("--format", choices=sorted(RESULTS_FILES), default=RESULTS_FORMAT,
+                        help="Storage format for quiz results (default: RESULTS_FORMAT or json)")
+    parser.add_argument("--convert-results", choices=sorted(RESULTS_FILES), metavar="FORMAT",
+                        help="Convert the stored results history to FORMAT and exit")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    quiz_manager = QuizManager()
-    quiz_manager.run_quiz()
\ No newline at end of file
+    args = parse_args(sys.argv[1:])
+
+    if args.convert_results:
+        convert_results(args.convert_results)
+    else:
+        quiz_manager = QuizManager(results_format=args.format)
+        quiz_manager.run_quiz()
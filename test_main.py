@@ -0,0 +1,445 @@
+import json
+import os
+
+import pytest
+
+import main
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def make_question(question_id, text="Q", points=10):
+    return main.Question(id=question_id, text=text, options=["A", "B"], points=points, type="single_choice")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run each test in an empty tree with two questions per section."""
+    monkeypatch.chdir(tmp_path)
+    for section_number in range(1, main.SECTION_COUNT + 1):
+        write_json(main.question_file_path(section_number), {
+            "questions": [main.asdict(make_question(1)), main.asdict(make_question(2))]
+        })
+    write_json("answers/answers.json", {"answers": {
+        f"section{section_number}": {"1": ["1"], "2": ["2"]} for section_number in range(1, main.SECTION_COUNT + 1)
+    }})
+    return tmp_path
+
+
+# --- Question bank edits (delta log) ---
+
+def test_delta_log_is_replayed_on_load(workdir):
+    section = main.QuizSection(1)
+    section.commit_question(make_question(2, text="Updated"), ["1"])
+    section.commit_question(make_question(section.allocate_question_id(), text="New"), ["2"])
+
+    reloaded = main.QuizSection(1)
+    assert reloaded.get_question(2).text == "Updated"
+    assert reloaded.get_question(3).text == "New"
+    assert [q.id for q in reloaded.questions] == [1, 2, 3]
+    assert reloaded.pending_edits == 2
+    assert main.load_answer_keys()["answers"]["section1"] == {"1": ["1"], "2": ["1"], "3": ["2"]}
+
+
+def test_torn_trailing_line_is_skipped(workdir):
+    section = main.QuizSection(1)
+    section.commit_question(make_question(1, text="Committed"), ["2"])
+    with open(main.question_delta_path(1), 'a', encoding='utf-8') as f:
+        f.write('{"question": {"id": 2, "te')
+
+    assert len(main.read_question_deltas(1)) == 1
+    assert main.QuizSection(1).get_question(2).text == "Q"
+
+    # A later commit must not be glued onto the torn fragment
+    section.commit_question(make_question(2, text="After"), ["1"])
+    assert [record["question"]["text"] for record in main.read_question_deltas(1)] == ["Committed", "After"]
+
+
+def test_compaction_folds_log_into_section_and_answer_files(workdir):
+    section = main.QuizSection(2)
+    section.commit_question(make_question(section.allocate_question_id(), text="New"), ["2"])
+    section.commit_question(make_question(1, text="Changed"), ["2"])
+    section.compact_questions()
+
+    assert not os.path.exists(main.question_delta_path(2))
+    with open(main.question_file_path(2), encoding='utf-8') as f:
+        section_data = json.load(f)
+    assert section_data["next_id"] == 4
+    assert [q["text"] for q in section_data["questions"]] == ["Changed", "Q", "New"]
+    with open("answers/answers.json", encoding='utf-8') as f:
+        assert json.load(f)["answers"]["section2"] == {"1": ["2"], "2": ["2"], "3": ["2"]}
+
+
+def test_compaction_leaves_other_sections_logs_alone(workdir):
+    main.QuizSection(1).commit_question(make_question(1, text="Other"), ["2"])
+    main.QuizSection(2).compact_questions()
+
+    assert os.path.exists(main.question_delta_path(1))
+    with open("answers/answers.json", encoding='utf-8') as f:
+        assert json.load(f)["answers"]["section1"]["1"] == ["1"]  # Not folded yet
+    assert main.load_answer_keys()["answers"]["section1"]["1"] == ["2"]
+
+
+def test_compaction_runs_at_threshold(workdir, monkeypatch):
+    monkeypatch.setattr(main, "DELTA_COMPACT_THRESHOLD", 2)
+    section = main.QuizSection(3)
+    section.commit_question(make_question(1, text="a"), ["1"])
+    assert os.path.exists(main.question_delta_path(3))
+    section.commit_question(make_question(2, text="b"), ["1"])
+    assert not os.path.exists(main.question_delta_path(3))
+    assert section.pending_edits == 0
+
+
+def test_ids_are_not_reused_after_compaction(workdir):
+    section = main.QuizSection(4)
+    new_id = section.allocate_question_id()
+    section.commit_question(make_question(new_id), ["1"])
+    section.allocate_question_id()  # Allocated but never committed
+    section.compact_questions()
+
+    assert main.QuizSection(4).allocate_question_id() == new_id + 2
+
+
+def test_save_results_reads_answer_keys_once(workdir, monkeypatch):
+    calls = []
+    original = main.load_answer_keys
+    monkeypatch.setattr(main, "load_answer_keys", lambda: calls.append(1) or original())
+
+    quiz_manager = main.QuizManager()
+    quiz_manager.user = main.User(name="Ada", surname="Lovelace", hashed_password="x", user_class="7-A")
+    for section in quiz_manager.sections:
+        section.user_answers = {"1": "1", "2": "1"}
+    quiz_manager.results = {f"Section {n}": 50.0 for n in range(1, main.SECTION_COUNT + 1)}
+    quiz_manager.save_results(50.0)
+
+    assert len(calls) == 1
+
+
+def test_update_lists_questions_before_asking_for_id(workdir, monkeypatch, capsys):
+    main.QuizSection(1).commit_question(make_question(2, text="Second"), ["2"])
+    answers = iter(["2", "2", "Edited", "", "1", ""])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+    main.QuizManager().add_or_update_question(1)
+
+    output = capsys.readouterr().out
+    assert "1. Q\n2. Second\n" in output
+    assert main.QuizSection(1).get_question(2).text == "Edited"
+
+
+# --- Compact results format ---
+
+def student_record(name, surname, user_class, overall_score):
+    return {
+        "name": name,
+        "surname": surname,
+        "class": user_class,
+        "section_scores": {"Section 1": overall_score, "Section 2": 100.0 - overall_score},
+        "overall_score": overall_score,
+        "status": "PASSED" if overall_score >= 75 else "FAILED",
+    }
+
+
+def sample_history():
+    return {"results": {
+        "2024-05-01": {
+            "student_results": {
+                "ada_lovelace": student_record("Ada", "Lovelace", "7-A", 80.0),
+                "alan_turing": student_record("Alan", "Turing", None, 66.66666666666667),
+            },
+            "section_statistics": {"1": {
+                "question_stats": {"1": {"correct": 1, "incorrect": 1}},
+                "class_stats": {"7-A": {"correct": 1, "incorrect": 0}, "Unknown": {"correct": 0, "incorrect": 1}},
+                "overall": {"correct": 1, "incorrect": 1},
+            }},
+        },
+        "2024-05-02": {
+            "student_results": {"grace_hopper": student_record("Grace", "Hopper", "7-B", 95.5)},
+            "section_statistics": {},
+        },
+    }}
+
+
+def materialize(results_json):
+    return json.loads(json.dumps(results_json, default=dict))
+
+
+@pytest.fixture(params=["zstd", "gzip"])
+def codec(request, monkeypatch):
+    if request.param == "zstd":
+        pytest.importorskip("zstandard")
+    else:
+        monkeypatch.setattr(main, "get_zstandard", lambda: None)
+    return request.param
+
+
+def test_compact_round_trip(codec):
+    blob = main.encode_compact_results(sample_history())
+    expected_magic = main.ZSTD_MAGIC if codec == "zstd" else b"\x1f\x8b"
+    assert blob.startswith(expected_magic)
+    assert materialize(main.decode_compact_results(blob)) == sample_history()
+
+
+def test_compact_round_trip_keeps_name_spelling_per_day(codec):
+    history = {"results": {
+        "2024-05-01": {"student_results": {"ada_x": student_record("Ada", "X", "7-A", 80.0)}, "section_statistics": {}},
+        "2024-05-02": {"student_results": {"ada_x": student_record("ada", "x", "7-A", 60.0)}, "section_statistics": {}},
+    }}
+    results = main.decode_compact_results(main.encode_compact_results(history))["results"]
+
+    assert "ada_x" in results["2024-05-01"]["student_results"]
+    assert "ada_x" in results["2024-05-02"]["student_results"]
+    assert materialize({"results": results}) == history
+
+
+def test_compact_round_trip_keeps_score_types_and_partial_sections(codec):
+    timed_out = student_record("Bob", "Y", "7-A", 0)
+    timed_out["section_scores"] = {"Section 1": 0}  # Time ran out after one section
+    history = {"results": {"2024-05-01": {
+        "student_results": {"ada_x": student_record("Ada", "X", "7-A", 80.0), "bob_y": timed_out},
+        "section_statistics": {},
+    }}}
+    decoded = materialize(main.decode_compact_results(main.encode_compact_results(history)))
+
+    assert decoded == history
+    bob = decoded["results"]["2024-05-01"]["student_results"]["bob_y"]
+    assert type(bob["overall_score"]) is int and type(bob["section_scores"]["Section 1"]) is int
+
+
+def test_unmaterialized_student_lookup(codec):
+    results = main.decode_compact_results(main.encode_compact_results(sample_history()))["results"]
+    student_results = results["2024-05-01"]["student_results"]
+
+    assert "alan_turing" in student_results
+    assert "grace_hopper" not in student_results  # Known student, other day
+    assert "nobody_here" not in student_results
+    assert student_results.get("nobody_here") is None
+    with pytest.raises(KeyError):
+        student_results["grace_hopper"]
+    assert student_results._data is None
+
+    assert student_results["alan_turing"] == sample_history()["results"]["2024-05-01"]["student_results"]["alan_turing"]
+    assert student_results._data is not None
+
+
+def test_untouched_blocks_are_copied_when_students_are_added(codec):
+    results_json = main.decode_compact_results(main.encode_compact_results(sample_history()))
+    untouched = results_json["results"]["2024-05-01"]
+    raw_students, raw_sections = untouched["student_results"]._raw, untouched["section_statistics"]._raw
+
+    results_json["results"]["2024-05-02"]["student_results"]["linus_t"] = student_record("Linus", "T", "7-A", 50.0)
+    results_json["results"]["2024-05-03"] = {
+        "student_results": {"ada_lovelace": student_record("Ada", "Lovelace", "7-A", 90.0)},
+        "section_statistics": {},
+    }
+    blob = main.encode_compact_results(results_json)
+    assert untouched["student_results"]._data is None  # Encoding did not decode it
+
+    reloaded = main.decode_compact_results(blob)["results"]
+    assert reloaded["2024-05-01"]["student_results"]._raw == raw_students
+    assert reloaded["2024-05-01"]["section_statistics"]._raw == raw_sections
+    assert "linus_t" in reloaded["2024-05-02"]["student_results"]
+    assert reloaded["2024-05-03"]["student_results"]["ada_lovelace"]["overall_score"] == 90.0
+    assert materialize({"results": reloaded})["results"]["2024-05-01"] == sample_history()["results"]["2024-05-01"]
+
+
+def test_convert_between_formats_keeps_single_history(workdir, codec):
+    main.save_results_file(sample_history(), "json")
+
+    main.convert_results("compact")
+    assert not os.path.exists(main.RESULTS_FILES["json"])
+    assert os.path.exists(main.RESULTS_FILES["json"] + ".bak")
+    assert materialize(main.load_results("compact")) == sample_history()
+
+    main.convert_results("json")
+    assert not os.path.exists(main.RESULTS_FILES["compact"])
+    with open(main.RESULTS_FILES["json"], encoding='utf-8') as f:
+        assert json.load(f) == sample_history()
+
+
+def test_load_falls_back_only_when_chosen_file_is_missing(workdir):
+    main.save_results_file(sample_history(), "json")
+    assert materialize(main.load_results("compact")) == sample_history()
+
+    main.save_results_file({"results": {}}, "compact")  # Supersedes results.json
+    assert not os.path.exists(main.RESULTS_FILES["json"])
+    assert main.load_results("compact") == {"results": {}}
+
+
+def test_corrupt_compact_file_raises_and_is_not_overwritten(workdir, codec):
+    blob = main.encode_compact_results(sample_history())
+    os.makedirs("results", exist_ok=True)
+    with open(main.RESULTS_FILES["compact"], 'wb') as f:
+        f.write(blob[:len(blob) // 2])
+    with pytest.raises(main.CorruptResultsError):
+        main.load_results("compact")
+
+    quiz_manager = main.QuizManager(results_format="compact")
+    quiz_manager.user = main.User(name="Ada", surname="Lovelace", hashed_password="x", user_class="7-A")
+    quiz_manager.results = {"Section 1": 50.0}
+    quiz_manager.save_results(50.0)
+    with open(main.RESULTS_FILES["compact"], 'rb') as f:
+        assert f.read() == blob[:len(blob) // 2]
+
+
+def test_corrupt_json_file_raises(workdir):
+    os.makedirs("results", exist_ok=True)
+    with open(main.RESULTS_FILES["json"], 'w', encoding='utf-8') as f:
+        f.write('{"results": {"2024-')
+    with pytest.raises(main.CorruptResultsError):
+        main.load_results("json")
+
+
+# --- Score index ---
+
+def build_index(scores, user_class="7-A"):
+    index = main.ScoreIndex("2024-05-01")
+    for position, score in enumerate(scores):
+        index.add(f"s{position}", student_record(f"S{position}", "X", user_class, score))
+    return index
+
+
+def test_rank_percentile_and_top_k():
+    index = build_index([40.0, 90.0, 75.0, 90.0, 10.0])
+
+    assert index.top_k("7-A", "overall", 2) == [[90.0, "s3"], [90.0, "s1"]]
+    assert index.top_k("7-A", "overall", 0) == []
+    assert index.rank("7-A", "overall", 90.0) == 1
+    assert index.rank("7-A", "overall", 75.0) == 3
+    assert index.rank("7-A", "overall", 5.0) == 6
+    assert index.percentile(main.SCHOOL_SCOPE, "overall", 75.0) == 60.0
+    assert index.percentile(main.SCHOOL_SCOPE, "overall", 90.0) == 100.0
+    assert index.percentile("7-B", "overall", 50.0) == 0.0
+    assert index.rank("7-A", "Section 2", 60.0) == 2  # Section 2 = 100 - overall
+
+
+def test_histogram_band_edges():
+    index = build_index([0.0, 9.99, 10.0, 89.5, 90.0, 100.0])
+
+    histogram = index.histogram("7-A", "overall")
+    assert histogram[0] == ["0-10", 2]
+    assert histogram[1] == ["10-20", 1]
+    assert histogram[-1] == ["90-100", 2]  # 100 falls in the last band
+    assert sum(count for _, count in histogram) == 6
+
+    assert index.histogram("7-A", "overall", bin_width=30) == [
+        ["0-30", 3], ["30-60", 0], ["60-90", 1], ["90-100", 2]
+    ]
+    assert index.histogram("7-A", "overall", bin_width=150) == [["0-100", 6]]
+
+
+def take_quiz(score, name="Ada", user_class="7-A", results_format="json"):
+    quiz_manager = main.QuizManager(results_format=results_format)
+    quiz_manager.user = main.User(name=name, surname="X", hashed_password="x", user_class=user_class)
+    quiz_manager.sections[0].user_answers = {"1": "1"}
+    quiz_manager.results = {"Section 1": score}
+    quiz_manager.save_results(score)
+
+
+def today_index():
+    date = main.datetime.now().strftime("%Y-%m-%d")
+    day_results = main.load_results()["results"][date]
+    with open(main.ScoreIndex.file_path(date), encoding='utf-8') as f:
+        stored = json.load(f)
+    return stored, day_results
+
+
+def test_same_day_retake_replaces_indexed_score(workdir):
+    take_quiz(40.0)
+    take_quiz(70.0, name="Bob")
+    take_quiz(95.0)  # Ada again
+
+    stored, day_results = today_index()
+    assert stored["scopes"][main.SCHOOL_SCOPE]["overall"] == [[70.0, "bob_x"], [95.0, "ada_x"]]
+    assert stored["revision"] == day_results["revision"] == 3
+
+
+def test_stale_index_is_rebuilt_for_queried_date(workdir):
+    take_quiz(40.0)
+    date = main.datetime.now().strftime("%Y-%m-%d")
+    results_json = main.load_results()
+    day_results = results_json["results"][date]
+    day_results["student_results"]["eve_x"] = student_record("Eve", "X", "7-A", 99.0)
+    day_results["revision"] += 1
+    main.save_results_file(results_json, "json")  # Results saved without touching the index
+
+    index = main.ScoreIndex.load(date, main.load_results()["results"][date])
+    assert index.top_k(main.SCHOOL_SCOPE, "overall", 1) == [[99.0, "eve_x"]]
+    assert today_index()[0]["revision"] == 2
+
+
+def test_current_index_is_used_without_decoding_results(workdir, codec):
+    take_quiz(40.0, results_format="compact")
+    date = main.datetime.now().strftime("%Y-%m-%d")
+    day_results = main.load_results("compact")["results"][date]
+
+    index = main.ScoreIndex.load(date, day_results)
+    assert index.top_k(main.SCHOOL_SCOPE, "overall", 1) == [[40.0, "ada_x"]]
+    assert day_results["student_results"]._data is None
+
+
+def test_unwritable_index_dir_still_serves_rebuilt_index(workdir, monkeypatch):
+    take_quiz(40.0)
+    date = main.datetime.now().strftime("%Y-%m-%d")
+    os.remove(main.ScoreIndex.file_path(date))
+
+    def failing_write(*args, **kwargs):
+        raise OSError("read-only file system")
+    monkeypatch.setattr(main, "write_json_atomic", failing_write)
+    index = main.ScoreIndex.load(date, main.load_results()["results"][date])
+    assert index.rank("7-A", "overall", 40.0) == 1
+
+
+def test_index_is_written_after_results(workdir, monkeypatch):
+    take_quiz(40.0)
+    stored_before, _ = today_index()
+
+    def failing_write(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(main, "save_results_file", failing_write)
+    with pytest.raises(OSError):
+        take_quiz(80.0, name="Bob")
+
+    stored_after, day_results = today_index()
+    assert stored_after == stored_before
+    assert "bob_x" not in day_results["student_results"]
+
+
+# --- Lazy section loading ---
+
+def test_sections_load_questions_on_first_use(workdir):
+    section = main.QuizSection(1)
+    assert section._questions is None
+    assert section.get_question(2).id == 2
+    assert section._questions is not None
+
+
+def test_commit_on_unloaded_section_counts_edit_once(workdir):
+    section = main.QuizSection(1)
+    section.commit_question(make_question(1, text="Edited"), ["2"])
+    assert section.pending_edits == 1
+    assert [q.text for q in section.questions] == ["Edited", "Q"]
+
+
+def test_allocate_on_unloaded_section_uses_stored_ids(workdir):
+    assert main.QuizSection(2).allocate_question_id() == 3
+
+
+# --- .env snapshot ---
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX file modes")
+def test_env_snapshot_is_readable_by_owner_only(workdir):
+    pytest.importorskip("dotenv")
+    with open(main.ENV_FILE, 'w', encoding='utf-8') as f:
+        f.write("ENCRYPTION_KEY=secret\n")
+
+    assert main.load_env_snapshot() == {"ENCRYPTION_KEY": "secret"}
+    assert os.stat(main.ENV_SNAPSHOT_FILE).st_mode & 0o777 == 0o600
+
+    os.chmod(main.ENV_SNAPSHOT_FILE, 0o644)  # Written by an earlier version
+    assert main.load_env_snapshot() == {"ENCRYPTION_KEY": "secret"}
+    assert os.stat(main.ENV_SNAPSHOT_FILE).st_mode & 0o777 == 0o600